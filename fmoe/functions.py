@@ -220,6 +220,29 @@ class MOEGather(Function):
         return global_grad_out_buf, None, None, None, None, None
 
 
+def _all_gather_dim0(inp, world_size, group):
+    r"""
+    All-gather `inp` along its first dimension into a single output tensor.
+    The flat-output collective is used when PyTorch provides one, so that no
+    extra copy is needed. Older versions fall back to gathering into views of
+    the output, where the copy happens inside the collective instead.
+    """
+    inp = inp.contiguous()
+    dim0 = inp.shape[0]
+    output = torch.empty((world_size * dim0,) + tuple(inp.shape[1:]),
+            dtype=inp.dtype, device=inp.device)
+    if hasattr(torch.distributed, "all_gather_into_tensor"):
+        torch.distributed.all_gather_into_tensor(output, inp, group=group)
+    elif hasattr(torch.distributed, "_all_gather_base"):
+        torch.distributed._all_gather_base(output, inp, group=group)
+    else:
+        tensor_list = [output[i * dim0 : (i + 1) * dim0]
+                for i in range(world_size)]
+        torch.distributed.all_gather(tensor_list, inp, group=group)
+    torch.cuda.synchronize()
+    return output
+
+
 class AllGather(Function):
     r"""
     A wrapper for the All-Gather function to support auto-differentiation.
@@ -227,10 +250,7 @@ class AllGather(Function):
 
     @staticmethod
     def forward(ctx, inp, rank, world_size, group):
-        tensor_list = [torch.empty_like(inp) for _ in range(world_size)]
-        torch.distributed.all_gather(tensor_list, inp, group=group)
-        torch.cuda.synchronize()
-        output = torch.cat(tensor_list, dim=0)
+        output = _all_gather_dim0(inp, world_size, group)
         ctx.args = rank, inp.shape[0]
         return output
 
@@ -258,8 +278,5 @@ class Slice(Function):
     @staticmethod
     def backward(ctx, grad_out):
         world_size, group = ctx.args
-        tensor_list = [torch.empty_like(grad_out) for _ in range(world_size)]
-        torch.distributed.all_gather(tensor_list, grad_out, group=group)
-        torch.cuda.synchronize()
-        grad_out = torch.cat(tensor_list, dim=0)
+        grad_out = _all_gather_dim0(grad_out, world_size, group)
         return grad_out, None, None, None
@@ -169,14 +169,37 @@ class FMoE(nn.Module):
         """
         if self.experts_fused:
             return self.experts(inp, fwd_expert_count)
-        outputs = []
+        counts = fwd_expert_count.tolist()
+        if torch.is_grad_enabled():
+            # Idle experts still have to run here, so that their parameters get
+            # (zero) grads on every data-parallel worker.
+            outputs = []
+            base_idx = 0
+            for i in range(self.num_expert):
+                batch_size = counts[i]
+                inp_slice = inp[base_idx : base_idx + batch_size]
+                outputs.append(self.experts[i](inp_slice))
+                base_idx += batch_size
+            return torch.cat(outputs, dim=0)
+        # Without autograd, idle experts are skipped and the outputs are written
+        # into a single buffer, so that they can be freed one by one.
+        output = None
         base_idx = 0
         for i in range(self.num_expert):
-            batch_size = fwd_expert_count[i].item()
+            batch_size = counts[i]
+            if batch_size == 0:
+                continue
             inp_slice = inp[base_idx : base_idx + batch_size]
-            outputs.append(self.experts[i](inp_slice))
+            out_slice = self.experts[i](inp_slice)
+            if output is None:
+                output = out_slice.new_empty(
+                    (inp.shape[0],) + tuple(out_slice.shape[1:])
+                )
+            output[base_idx : base_idx + batch_size] = out_slice
             base_idx += batch_size
-        return torch.cat(outputs, dim=0)
+        if output is None:
+            output = inp.new_empty((0, self.d_model))
+        return output
 
     def mark_parallel_comm(self, expert_dp_comm="none"):
         r"""
@@ -207,9 +230,10 @@ class FMoE(nn.Module):
         # delete masked tensors
         if self.mask is not None and self.mask_dict is not None:
             mask = self.mask.view(-1)
+            keep = mask == 0
             # to: (BxL') x d_model
-            inp = inp[mask == 0, :]
-            gate_top_k_idx = gate_top_k_idx[mask == 0, :]
+            inp = inp[keep, :]
+            gate_top_k_idx = gate_top_k_idx[keep, :]
 
         fwd = _fmoe_general_global_forward(
             inp,
@@ -224,7 +248,7 @@ class FMoE(nn.Module):
             # to: (BxL) x top_k x d_model
             x = torch.zeros(mask.shape[0], self.top_k, self.d_model, device=fwd.device, dtype=fwd.dtype)
             # recover
-            x[mask == 0] = fwd
+            x[keep] = fwd
             for k, v in self.mask_dict.items():
                 x[mask == k] = v
         else:
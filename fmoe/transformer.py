@@ -23,11 +23,15 @@ class _Expert(nn.Module):
         r"""
         First expand input to 4h (the hidden size is variable, but is called h4
         for convenience). Then perform activation. Finally shirink back to h.
+        The input is cast to the dtype of the expert weights, which may differ
+        from the rest of the model, and the output is cast back.
         """
-        x = self.htoh4(inp, fwd_expert_count)
+        inp_dtype = inp.dtype
+        x = inp.to(self.htoh4.weight.dtype)
+        x = self.htoh4(x, fwd_expert_count)
         x = self.activation(x)
         x = self.h4toh(x, fwd_expert_count)
-        return x
+        return x.to(inp_dtype)
 
 
 class FMoETransformerMLP(FMoE):
@@ -35,6 +39,14 @@ class FMoETransformerMLP(FMoE):
     A complete MoE MLP module in a Transformer block.
     * `activation` is the activation function to be used in MLP in each expert.
     * `d_hidden` is the dimension of the MLP layer.
+    * `compute_dtype` is the dtype of the experts' weights and computation,
+    e.g. `torch.float16` to use tensor cores, while the gate keeps the dtype of
+    the rest of the model. The experts follow the model dtype if it is `None`.
+    Only `torch.float16`, `torch.float32` and `torch.float64` are supported by
+    the expert kernels. Note that the expert parameters themselves are stored
+    in `compute_dtype`, so with `torch.float16` the optimizer updates them
+    without fp32 master weights, and that a later `model.half()` or
+    `model.float()` overrides `compute_dtype`.
     """
 
     def __init__(
@@ -51,7 +63,15 @@ class FMoETransformerMLP(FMoE):
         gate_hook=None,
         mask=None,
         mask_dict=None,
+        compute_dtype=None,
     ):
+        if compute_dtype not in (None, torch.float16, torch.float32,
+                torch.float64):
+            raise ValueError(
+                "compute_dtype {} is not supported by the expert kernels".format(
+                    compute_dtype
+                )
+            )
         super().__init__(
             num_expert=num_expert,
             d_model=d_model,
@@ -66,6 +86,8 @@ class FMoETransformerMLP(FMoE):
         self.experts = _Expert(
             num_expert, d_model, d_hidden, activation, rank=self.mp_rank
         )
+        if compute_dtype is not None:
+            self.experts.to(dtype=compute_dtype)
         self.mark_parallel_comm(expert_dp_comm)
 
     def forward(self, inp: torch.Tensor):
@@ -10,7 +10,7 @@ import numpy as np
 from copy import deepcopy
 from fmoe.gates import NaiveGate
 from fmoe.layers import FMoE
-from fmoe.transformer import _Expert
+from fmoe.transformer import _Expert, FMoETransformerMLP
 from fmoe.distributed import DistributedGroupedDataParallel as LocalDDP
 from fmoe.megatron.layers import _megatron_init_method
 from moe import BruteForceMoELinear, BruteForceMoE, NaiveExpert, LinearExpert
@@ -207,6 +207,59 @@ def test_fmoe_linear(
     _assert_numerical(names, moe_out_list, raw_out_list, rank, precision=precision)
 
 
+@pytest.mark.parametrize("num_expert", [4, 8])
+@pytest.mark.parametrize("top_k", [2, 3])
+@pytest.mark.parametrize("batch_size", [4])
+@pytest.mark.parametrize("d_model", [16])
+@pytest.mark.parametrize("d_hidden", [32])
+def test_fmoe_transformer_compute_dtype(
+    num_expert, top_k, batch_size, d_model, d_hidden
+):
+    torch.manual_seed(42)
+    torch.cuda.manual_seed(42)
+
+    moe = FMoETransformerMLP(
+        num_expert=num_expert,
+        d_model=d_model,
+        d_hidden=d_hidden,
+        top_k=top_k,
+        compute_dtype=torch.float16,
+    ).cuda()
+    rng = np.random.default_rng(1234)
+    _megatron_init_method(moe.experts.htoh4, rng, 1.0)
+    _megatron_init_method(moe.experts.h4toh, rng, 1.0)
+    assert moe.experts.htoh4.weight.dtype == torch.float16
+    assert moe.gate.gate.weight.dtype == torch.float32
+
+    # the same layer with the fp16 expert weights upcast to fp32
+    moe_raw = deepcopy(moe)
+    moe_raw.experts.float()
+
+    inp = torch.rand(batch_size, d_model).cuda()
+    inp_raw = inp.clone()
+    inp.requires_grad = True
+    inp_raw.requires_grad = True
+
+    moe_out = moe(inp)
+    raw_out = moe_raw(inp_raw)
+    assert moe_out.dtype == torch.float32
+
+    moe_out.mean().backward()
+    raw_out.mean().backward()
+
+    names = ["output", "input grad"]
+    _assert_numerical(
+        names, [moe_out, inp.grad], [raw_out, inp_raw.grad], 0, precision=5e-1
+    )
+
+
+def test_fmoe_transformer_compute_dtype_unsupported():
+    with pytest.raises(ValueError):
+        FMoETransformerMLP(
+            num_expert=4, d_model=16, d_hidden=32, compute_dtype=torch.bfloat16
+        )
+
+
 @pytest.mark.parametrize("batch_size", [4])
 @pytest.mark.parametrize("num_expert", [4, 8])
 @pytest.mark.parametrize("d_model", [16])
@@ -308,6 +361,34 @@ def test_fmoe(
     _assert_numerical(names, moe_out_list, raw_out_list, rank)
 
 
+@pytest.mark.parametrize("d_model", [16])
+@pytest.mark.parametrize("expert", [NaiveExpert, LinearExpert])
+@pytest.mark.parametrize("expert_count", [[3, 0, 5, 0], [0, 0, 0, 0]])
+def test_fmoe_experts_idle(d_model, expert, expert_count):
+    torch.manual_seed(42)
+    torch.cuda.manual_seed(42)
+
+    moe = FMoE(
+        num_expert=len(expert_count),
+        d_model=d_model,
+        gate=NaiveGate,
+        expert=expert,
+    ).cuda()
+
+    fwd_expert_count = torch.tensor(expert_count, dtype=torch.long)
+    inp = torch.rand(sum(expert_count), d_model).cuda()
+
+    # idle experts only run when gradients are recorded
+    raw_out = moe.expert_fn(inp, fwd_expert_count)
+    with torch.no_grad():
+        moe_out = moe.expert_fn(inp, fwd_expert_count)
+
+    assert moe_out.shape == raw_out.shape
+    assert moe_out.dtype == raw_out.dtype
+    if raw_out.numel() > 0:
+        _assert_numerical(["forward"], [moe_out], [raw_out], 0)
+
+
 class MyModule(nn.Module):
     def __init__(self, dim=8):
         super(MyModule, self).__init__()